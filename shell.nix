@@ -19,6 +19,8 @@ mkShell {
     python.pkgs.ruff
     python.pkgs.pytest
     python.pkgs.pytest-cov
+    python.pkgs.pytest-xdist
+    python.pkgs.dulwich
     python.pkgs.hatchling
   ];
 
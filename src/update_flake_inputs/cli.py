@@ -1,19 +1,58 @@
 """Command line interface for update-flake-inputs."""
 
 import argparse
+import concurrent.futures
 import logging
 import os
 import sys
+from collections.abc import Sequence
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
 from .exceptions import UpdateFlakeInputsError
-from .flake_service import FlakeService
-from .git_service import GitService
-from .gitea_service import GiteaService
+
+if TYPE_CHECKING:
+    from .flake_service import Flake, FlakeService
+    from .gitea_service import GiteaService
 
 logger = logging.getLogger(__name__)
 
 
+class EnvDefault(argparse.Action):
+    """Store action that falls back to an environment variable, then a default."""
+
+    def __init__(
+        self,
+        envvar: str,
+        default: str | None = None,
+        help: str | None = None,  # noqa: A002
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
+        """Initialize EnvDefault.
+
+        Args:
+            envvar: Environment variable to read the default from
+            default: Default used when the environment variable is unset
+            help: Help text, extended with the env var and default
+            **kwargs: Remaining arguments for argparse.Action
+
+        """
+        if help is not None:
+            fallback = f" or '{default}'" if default else ""
+            help = f"{help} (defaults to {envvar} env var{fallback})"  # noqa: A001
+        super().__init__(default=os.environ.get(envvar, default), help=help, **kwargs)
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,  # noqa: ARG002
+        namespace: argparse.Namespace,
+        values: str | Sequence[Any] | None,
+        option_string: str | None = None,  # noqa: ARG002
+    ) -> None:
+        """Store the value given on the command line."""
+        setattr(namespace, self.dest, values)
+
+
 def setup_logging(*, verbose: bool = False) -> None:
     """Set up logging configuration.
 
@@ -39,25 +78,33 @@ def parse_args() -> argparse.Namespace:
 
     parser.add_argument(
         "--gitea-url",
-        default=os.environ.get("GITEA_URL", ""),
-        help="Gitea server URL (defaults to GITEA_URL env var)",
+        action=EnvDefault,
+        envvar="GITEA_URL",
+        default="",
+        help="Gitea server URL",
     )
 
     parser.add_argument(
         "--gitea-token",
-        default=os.environ.get("GITEA_TOKEN", ""),
-        help="Gitea authentication token (defaults to GITEA_TOKEN env var)",
+        action=EnvDefault,
+        envvar="GITEA_TOKEN",
+        default="",
+        help="Gitea authentication token",
     )
 
     parser.add_argument(
         "--gitea-repository",
-        default=os.environ.get("GITEA_REPOSITORY", ""),
-        help="Repository in format owner/repo (defaults to GITEA_REPOSITORY env var)",
+        action=EnvDefault,
+        envvar="GITEA_REPOSITORY",
+        default="",
+        help="Repository in format owner/repo",
     )
 
     parser.add_argument(
         "--exclude-patterns",
-        default=os.environ.get("EXCLUDE_PATTERNS", ""),
+        action=EnvDefault,
+        envvar="EXCLUDE_PATTERNS",
+        default="",
         help="Comma-separated list of glob patterns to exclude flake.nix files",
     )
 
@@ -69,8 +116,10 @@ def parse_args() -> argparse.Namespace:
 
     parser.add_argument(
         "--branch-suffix",
-        default=os.environ.get("BRANCH_SUFFIX", ""),
-        help="Optional suffix to append to update branches (default: empty)",
+        action=EnvDefault,
+        envvar="BRANCH_SUFFIX",
+        default="",
+        help="Optional suffix to append to update branches",
     )
 
     parser.add_argument(
@@ -79,6 +128,14 @@ def parse_args() -> argparse.Namespace:
         help="Automatically merge PRs when checks succeed",
     )
 
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="Maximum number of inputs to update concurrently (default: min(8, CPU count))",
+    )
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -88,44 +145,48 @@ def parse_args() -> argparse.Namespace:
 
     parser.add_argument(
         "--git-author-name",
-        default=os.environ.get("GIT_AUTHOR_NAME", "gitea-actions[bot]"),
-        help="Git author name (defaults to GIT_AUTHOR_NAME env var or 'gitea-actions[bot]')",
+        action=EnvDefault,
+        envvar="GIT_AUTHOR_NAME",
+        default="gitea-actions[bot]",
+        help="Git author name",
     )
 
     parser.add_argument(
         "--git-author-email",
-        default=os.environ.get("GIT_AUTHOR_EMAIL", "gitea-actions[bot]@noreply.gitea.io"),
-        help=(
-            "Git author email (defaults to GIT_AUTHOR_EMAIL env var "
-            "or 'gitea-actions[bot]@noreply.gitea.io')"
-        ),
+        action=EnvDefault,
+        envvar="GIT_AUTHOR_EMAIL",
+        default="gitea-actions[bot]@noreply.gitea.io",
+        help="Git author email",
     )
 
     parser.add_argument(
         "--git-committer-name",
-        default=os.environ.get("GIT_COMMITTER_NAME", "gitea-actions[bot]"),
-        help="Git committer name (defaults to GIT_COMMITTER_NAME env var or 'gitea-actions[bot]')",
+        action=EnvDefault,
+        envvar="GIT_COMMITTER_NAME",
+        default="gitea-actions[bot]",
+        help="Git committer name",
     )
 
     parser.add_argument(
         "--git-committer-email",
-        default=os.environ.get("GIT_COMMITTER_EMAIL", "gitea-actions[bot]@noreply.gitea.io"),
-        help=(
-            "Git committer email (defaults to GIT_COMMITTER_EMAIL env var "
-            "or 'gitea-actions[bot]@noreply.gitea.io')"
-        ),
+        action=EnvDefault,
+        envvar="GIT_COMMITTER_EMAIL",
+        default="gitea-actions[bot]@noreply.gitea.io",
+        help="Git committer email",
     )
 
     parser.add_argument(
         "--git-signing-key",
-        default=os.environ.get("GIT_SIGNING_KEY"),
-        help="Git SSH private key to use for commit signing (defaults to GIT_SIGNING_KEY env var')",
+        action=EnvDefault,
+        envvar="GIT_SIGNING_KEY",
+        help="Git SSH private key to use for commit signing",
     )
 
     parser.add_argument(
         "--git-signing-pubkey",
-        default=os.environ.get("GIT_SIGNING_PUBKEY"),
-        help="Git SSH public key to use for commit signing (defaults to GIT_SIGNING_PUBKEY env var')",
+        action=EnvDefault,
+        envvar="GIT_SIGNING_PUBKEY",
+        help="Git SSH public key to use for commit signing",
     )
 
     return parser.parse_args()
@@ -134,6 +195,8 @@ def parse_args() -> argparse.Namespace:
 def validate_args(args: argparse.Namespace) -> None:
     """Validate command line arguments.
 
+    Also splits the repository into ``args.owner`` and ``args.repo``.
+
     Args:
         args: Parsed arguments
 
@@ -155,22 +218,29 @@ def validate_args(args: argparse.Namespace) -> None:
         )
         sys.exit(1)
 
-    if "/" not in args.gitea_repository:
+    parts = args.gitea_repository.split("/", 1)
+    if len(parts) != 2 or not parts[0] or not parts[1]:  # noqa: PLR2004
         logger.error(
             "Repository must be in format owner/repo, got: %s",
             args.gitea_repository,
         )
         sys.exit(1)
+    args.owner, args.repo = parts
+
+    if args.jobs < 1:
+        logger.error("Jobs must be at least 1, got: %d", args.jobs)
+        sys.exit(1)
 
 
 def process_flake_updates(  # noqa: PLR0913
-    flake_service: FlakeService,
-    gitea_service: GiteaService,
+    flake_service: "FlakeService",
+    gitea_service: "GiteaService",
     exclude_patterns: str,
     base_branch: str,
     branch_suffix: str,
     *,
     auto_merge: bool,
+    jobs: int = 1,
 ) -> None:
     """Process all flake updates.
 
@@ -181,6 +251,7 @@ def process_flake_updates(  # noqa: PLR0913
         base_branch: Base branch for PRs
         branch_suffix: Optional suffix to append to branch names
         auto_merge: Whether to automatically merge PRs
+        jobs: Maximum number of inputs to update concurrently
 
     """
     # Discover flake files
@@ -191,80 +262,138 @@ def process_flake_updates(  # noqa: PLR0913
 
     logger.info("Found %d flake files to process", len(flakes))
 
-    # Process each flake
-    for flake in flakes:
-        logger.info("Processing flake: %s", flake.file_path)
-        logger.info("Inputs to update: %s", ", ".join(flake.inputs))
-
-        # Update each input
-        for input_name in flake.inputs:
-            try:
-                # Generate branch name - don't include '.' for root directory
-                parent_path = Path(flake.file_path).parent
-                if parent_path == Path():
-                    branch_name = f"update-{input_name}"
+    # Normalize the branch suffix once for all branches
+    suffix = branch_suffix.strip().replace("/", "-").strip("-")
+    branch_suffix_part = f"-{suffix}" if suffix else ""
+
+    # Process each flake, fanning its inputs out to a bounded pool of workers
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            futures: dict[concurrent.futures.Future[None], tuple[Flake, str]] = {}
+            for flake in flakes:
+                logger.info("Processing flake: %s", flake.file_path)
+                logger.info("Inputs to update: %s", ", ".join(flake.inputs))
+
+                # Generate branch name prefix - don't include '.' for root directory
+                # dirname gives "" for a root flake, which the names below rely on
+                parent_dir = os.path.dirname(flake.file_path)  # noqa: PTH120
+                if parent_dir:
+                    branch_prefix = f"update-{parent_dir.replace('/', '-').strip('-')}-"
                 else:
-                    branch_name = f"update-{parent_path}-{input_name}"
-                branch_name = branch_name.replace("/", "-").strip("-")
-                suffix = branch_suffix.strip().replace("/", "-").strip("-")
-                if suffix:
-                    branch_name = f"{branch_name}-{suffix}"
-
-                logger.info(
-                    "Updating input %s in %s (branch: %s)",
-                    input_name,
-                    flake.file_path,
-                    branch_name,
-                )
-
-                # Create worktree and update input
-                with gitea_service.worktree(branch_name) as worktree_path:
-                    # Update the input
-                    flake_service.update_flake_input(
+                    branch_prefix = "update-"
+
+                for input_name in flake.inputs:
+                    branch_name = f"{branch_prefix}{input_name}{branch_suffix_part}"
+                    if parent_dir:
+                        commit_message = f"Update {input_name} in {parent_dir}"
+                    else:
+                        commit_message = f"Update {input_name}"
+
+                    future = executor.submit(
+                        _update_one_input,
+                        flake_service,
+                        gitea_service,
+                        flake,
+                        input_name=input_name,
+                        branch_name=branch_name,
+                        commit_message=commit_message,
+                        base_branch=base_branch,
+                        auto_merge=auto_merge,
+                    )
+                    futures[future] = (flake, input_name)
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception:
+                    flake, input_name = futures[future]
+                    logger.exception(
+                        "Failed to update input %s in %s",
                         input_name,
                         flake.file_path,
-                        str(worktree_path),
                     )
+                    # Continue with next input
+        except BaseException:
+            # Don't start queued inputs once the run is stopping; leaving the
+            # with block then only waits for the inputs already in progress
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def _update_one_input(  # noqa: PLR0913
+    flake_service: "FlakeService",
+    gitea_service: "GiteaService",
+    flake: "Flake",
+    *,
+    input_name: str,
+    branch_name: str,
+    commit_message: str,
+    base_branch: str,
+    auto_merge: bool,
+) -> None:
+    """Update a single flake input on its own branch and open a PR for it.
 
-                    # Commit changes
-                    parent_path = Path(flake.file_path).parent
-                    if parent_path == Path():
-                        commit_message = f"Update {input_name}"
-                    else:
-                        commit_message = f"Update {input_name} in {parent_path}"
-                    if gitea_service.commit_changes(
-                        branch_name,
-                        commit_message,
-                        worktree_path,
-                    ):
-                        # Create pull request
-                        pr_title = commit_message
-                        pr_body = (
-                            f"This PR updates the `{input_name}` input "
-                            f"in `{flake.file_path}`.\n\n"
-                            "Generated by update-flake-inputs action."
-                        )
-                        gitea_service.create_pull_request(
-                            branch_name,
-                            base_branch,
-                            pr_title,
-                            pr_body,
-                            auto_merge=auto_merge,
-                        )
-                    else:
-                        logger.info(
-                            "No changes for input %s in %s",
-                            input_name,
-                            flake.file_path,
-                        )
+    Args:
+        flake_service: Flake service instance
+        gitea_service: Gitea service instance
+        flake: Flake containing the input
+        input_name: Name of the input to update
+        branch_name: Branch to commit the update to
+        commit_message: Commit message, also used as the PR title
+        base_branch: Base branch for PRs
+        auto_merge: Whether to automatically merge PRs
+
+    """
+    logger.info(
+        "Updating input %s in %s (branch: %s)",
+        input_name,
+        flake.file_path,
+        branch_name,
+    )
 
-            except Exception:
-                logger.exception(
-                    "Failed to update input %s in %s",
-                    input_name,
-                    flake.file_path,
-                )
-                # Continue with next input
+    # Create worktree and update input
+    with gitea_service.worktree(branch_name) as worktree_path:
+        # The lock file may not be committed yet, in which case the update
+        # creates it in the worktree
+        lock_file = worktree_path / Path(flake.file_path).parent / "flake.lock"
+        lock_before = lock_file.read_bytes() if lock_file.exists() else None
+
+        # Update the input
+        flake_service.update_flake_input(
+            input_name,
+            flake.file_path,
+            str(worktree_path),
+        )
+
+        # An up-to-date input leaves the lock file untouched, in which case
+        # there is nothing to stage or commit
+        lock_after = lock_file.read_bytes() if lock_file.exists() else None
+        if lock_after == lock_before or not gitea_service.commit_changes(
+            branch_name,
+            commit_message,
+            worktree_path,
+        ):
+            logger.info(
+                "No changes for input %s in %s",
+                input_name,
+                flake.file_path,
+            )
+            return
+
+        # Create pull request
+        pr_title = commit_message
+        pr_body = (
+            f"This PR updates the `{input_name}` input "
+            f"in `{flake.file_path}`.\n\n"
+            "Generated by update-flake-inputs action."
+        )
+        gitea_service.create_pull_request(
+            branch_name,
+            base_branch,
+            pr_title,
+            pr_body,
+            auto_merge=auto_merge,
+        )
 
 
 def main() -> None:
@@ -274,25 +403,30 @@ def main() -> None:
         setup_logging(verbose=args.verbose)
         validate_args(args)
 
-        # Parse repository
-        owner, repo = args.gitea_repository.split("/", 1)
+        # Import services only once arguments are known to be usable, so
+        # --help and argument errors don't pay for loading them
+        from .flake_service import FlakeService  # noqa: PLC0415
+        from .git_service import GitService  # noqa: PLC0415
+        from .gitea_service import GiteaService  # noqa: PLC0415
 
         # Create services
         flake_service = FlakeService()
+        # git_service owns the signing key files that git_env points at, so it
+        # must stay referenced until gitea_service has finished running git
         git_service = GitService(
             private_key=args.git_signing_key,
             public_key=args.git_signing_pubkey,
-            path=Path()
         )
         gitea_service = GiteaService(
             api_url=args.gitea_url,
             token=args.gitea_token,
-            owner=owner,
-            repo=repo,
+            owner=args.owner,
+            repo=args.repo,
             git_author_name=args.git_author_name,
             git_author_email=args.git_author_email,
             git_committer_name=args.git_committer_name,
             git_committer_email=args.git_committer_email,
+            git_env=git_service.git_env_overrides,
         )
 
         # Process updates
@@ -303,6 +437,7 @@ def main() -> None:
             args.base_branch,
             args.branch_suffix,
             auto_merge=args.auto_merge,
+            jobs=args.jobs,
         )
 
         logger.info("Completed processing all flake updates")
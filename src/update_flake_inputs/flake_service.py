@@ -3,6 +3,8 @@
 import fnmatch
 import json
 import logging
+import os
+import re
 import subprocess
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -11,6 +13,9 @@ from .exceptions import FlakeServiceError
 
 logger = logging.getLogger(__name__)
 
+# Directories that never contain flakes we want to update
+IGNORED_DIRECTORIES = frozenset({"node_modules", ".git", "__pycache__"})
+
 
 @dataclass
 class Flake:
@@ -21,9 +26,13 @@ class Flake:
     excluded_outputs: list[str] = field(default_factory=list)
 
 
+@dataclass
 class FlakeService:
     """Service for discovering and updating Nix flakes."""
 
+    # Repository that flake file paths are relative to
+    repo_path: Path = field(default_factory=Path)
+
     def discover_flake_files(self, exclude_patterns: str = "") -> list[Flake]:
         """Discover all flake.nix files in the repository.
 
@@ -35,16 +44,6 @@ class FlakeService:
 
         """
         try:
-            # Find all flake.nix files
-            all_flake_files = list(Path().rglob("flake.nix"))
-
-            # Remove common ignore patterns
-            all_flake_files = [
-                f
-                for f in all_flake_files
-                if not any(part in f.parts for part in ["node_modules", ".git", "__pycache__"])
-            ]
-
             exclude_list = (
                 [p.strip() for p in exclude_patterns.split(",") if p.strip()]
                 if exclude_patterns
@@ -52,26 +51,53 @@ class FlakeService:
             )
             logger.info("Exclude patterns: %s", exclude_list)
 
+            # Compile each pattern once up front rather than per file: plain
+            # patterns share one union regex, input exclusions keep their output
+            file_patterns = [p for p in exclude_list if "#" not in p]
+            file_exclude_re = self._compile_patterns(file_patterns)
+            output_excludes = [
+                (re.compile(fnmatch.translate(file_pattern)), output_name)
+                for file_pattern, output_name in (p.split("#", 1) for p in exclude_list if "#" in p)
+            ]
+
+            # A directory matching the prefix of a "dir/*" or "dir/**" pattern
+            # can only contain excluded files, so it doesn't need to be walked
+            dir_patterns: list[str] = []
+            for pattern in file_patterns:
+                dir_pattern = pattern.rstrip("*")
+                if dir_pattern != pattern and dir_pattern.endswith("/") and dir_pattern != "/":
+                    dir_patterns.append(dir_pattern.removesuffix("/"))
+            dir_exclude_re = self._compile_patterns(dir_patterns)
+
+            # Find all flake.nix files, pruning ignored and excluded directories
+            # before descending into them. Symlinked directories (such as nix
+            # build `result` links) are not followed.
+            all_flake_files: list[str] = []
+            for root, dirnames, filenames in os.walk(self.repo_path, followlinks=False):
+                rel_root = os.path.relpath(root, self.repo_path)
+                prefix = "" if rel_root == os.curdir else f"{rel_root}/"
+                dirnames[:] = sorted(
+                    d
+                    for d in dirnames
+                    if d not in IGNORED_DIRECTORIES
+                    and not (dir_exclude_re and dir_exclude_re.match(prefix + d))
+                )
+                if "flake.nix" in filenames:
+                    all_flake_files.append(f"{prefix}flake.nix")
+
             flakes: list[Flake] = []
 
             for file in all_flake_files:
                 # Check if this file should be completely excluded
-                should_exclude_file = False
-                excluded_outputs = []
-
-                for pattern in exclude_list:
-                    if "#" in pattern:
-                        file_pattern, output_name = pattern.split("#", 1)
-                        if self._match_pattern(file_pattern, str(file)):
-                            excluded_outputs.append(output_name)
-                    elif self._match_pattern(pattern, str(file)):
-                        should_exclude_file = True
-                        break
+                should_exclude_file = bool(file_exclude_re and file_exclude_re.match(file))
+                excluded_outputs = [
+                    output_name for pattern, output_name in output_excludes if pattern.match(file)
+                ]
 
                 if not should_exclude_file:
                     # Check if lock file exists
-                    lock_file_path = self._get_flake_lock_path(str(file))
-                    if not Path(lock_file_path).exists():
+                    lock_file_path = self._get_flake_lock_path(file)
+                    if not (self.repo_path / lock_file_path).exists():
                         logger.info(
                             "Skipping %s - no lock file found at %s",
                             file,
@@ -80,10 +106,10 @@ class FlakeService:
                         continue
 
                     # Get inputs for this flake
-                    temp_flake = Flake(str(file), [], excluded_outputs)
+                    temp_flake = Flake(file, [], excluded_outputs)
                     inputs = self.get_flake_inputs(temp_flake)
 
-                    flakes.append(Flake(str(file), inputs, excluded_outputs))
+                    flakes.append(Flake(file, inputs, excluded_outputs))
 
             logger.info("Found %d flake files after exclusions", len(flakes))
         except Exception as e:
@@ -103,8 +129,7 @@ class FlakeService:
 
         """
         try:
-            flake_path = Path(flake.file_path)
-            flake_dir = flake_path.parent or Path()
+            flake_dir = (self.repo_path / flake.file_path).parent
 
             # Use nix flake metadata to get inputs
             cmd = [
@@ -170,8 +195,8 @@ class FlakeService:
         try:
             logger.info("Updating flake input: %s in %s", input_name, flake_file)
 
-            # If work_dir is provided, resolve the flake file relative to it
-            absolute_flake_path = Path(work_dir) / flake_file if work_dir else Path(flake_file)
+            # Resolve the flake file relative to work_dir if given, else the repository
+            absolute_flake_path = (Path(work_dir) if work_dir else self.repo_path) / flake_file
 
             flake_dir = absolute_flake_path.parent or Path()
             absolute_flake_dir = flake_dir.resolve()
@@ -233,6 +258,8 @@ class FlakeService:
         flake_path = Path(flake_file)
         return str(flake_path.parent / "flake.lock")
 
-    def _match_pattern(self, pattern: str, path: str) -> bool:
-        """Match a glob pattern against a path."""
-        return fnmatch.fnmatch(path, pattern)
+    def _compile_patterns(self, patterns: list[str]) -> re.Pattern[str] | None:
+        """Compile glob patterns into a single regex matching any of them."""
+        if not patterns:
+            return None
+        return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
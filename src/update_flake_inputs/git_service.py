@@ -1,24 +1,21 @@
 """Service for interacting with Git."""
 
 import os
-import subprocess
 import sys
 import time
 import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
-@dataclass
+@dataclass(slots=True)
 class GitService:
     """Service for interacting with Git."""
 
-    private_key: str
-    public_key: str
-    path: Path
+    private_key: str | None
+    public_key: str | None
 
-    __key_directory: tempfile.TemporaryDirectory = None
-    __scope: str = "--local"
+    __key_directory: tempfile.TemporaryDirectory[str] | None = field(default=None, init=False)
 
     def __post_init__(self) -> None:
         self.__configure_commit_signing()
@@ -30,30 +27,44 @@ class GitService:
             keyFile = Path(self.__key_directory.name) / "signing_key"
             pubkeyFile = Path(self.__key_directory.name) / "signing_key.pub"
 
-            with open(keyFile, "w") as f:
-                f.write(self.private_key)
-                f.write('\n')
-            with open(pubkeyFile, "w") as f:
-                f.write(self.public_key)
-                f.write('\n')
-
-            os.chmod(keyFile, 0o600)
-            os.chmod(pubkeyFile, 0o644)
-
-            subprocess.run(
-                ["git", "config", "set", self.__scope, "user.signingkey", pubkeyFile],
-                cwd=self.path,
-                check=True,
-            )
-
-            subprocess.run(
-                ["git", "config", "set", self.__scope, "gpg.format", "ssh"],
-                cwd=self.path,
-                check=True,
-            )
-
-            subprocess.run(
-                ["git", "config", "set", self.__scope, "commit.gpgsign", "true"],
-                cwd=self.path,
-                check=True,
-            )
+            # Create the key files with their final permissions so the private
+            # key is never readable by others, even briefly
+            self.__write_key_file(keyFile, self.private_key, 0o600)
+            self.__write_key_file(pubkeyFile, self.public_key, 0o644)
+
+    @property
+    def git_env_overrides(self) -> dict[str, str]:
+        """Environment variables applying the commit signing config to git.
+
+        Uses git's GIT_CONFIG_COUNT/GIT_CONFIG_KEY_<n>/GIT_CONFIG_VALUE_<n>
+        protocol, keeping any entries already set in the environment, so the
+        repository's config files are never modified.
+
+        Returns:
+            Variables to merge into the environment of git commands, empty
+            when commit signing is not configured
+
+        """
+        if self.__key_directory is None:
+            return {}
+
+        settings = {
+            "user.signingkey": str(Path(self.__key_directory.name) / "signing_key.pub"),
+            "gpg.format": "ssh",
+            "commit.gpgsign": "true",
+        }
+        # An unset or empty count means no entries are set yet
+        offset = int(os.environ.get("GIT_CONFIG_COUNT") or "0")
+        env = {"GIT_CONFIG_COUNT": str(offset + len(settings))}
+        for index, (key, value) in enumerate(settings.items(), start=offset):
+            env[f"GIT_CONFIG_KEY_{index}"] = key
+            env[f"GIT_CONFIG_VALUE_{index}"] = value
+        return env
+
+    @staticmethod
+    def __write_key_file(path: Path, key: str, mode: int) -> None:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        try:
+            os.write(fd, (key + "\n").encode("utf-8"))
+        finally:
+            os.close(fd)
@@ -6,16 +6,17 @@ import logging
 import os
 import subprocess
 import tempfile
+import threading
 import time
 import urllib.error
 import urllib.parse
 import urllib.request
 from collections.abc import Iterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
-from .exceptions import APIError
+from .exceptions import APIError, GiteaServiceError
 
 logger = logging.getLogger(__name__)
 
@@ -57,6 +58,21 @@ class GiteaService:
     git_author_email: str = "gitea-actions[bot]@noreply.gitea.io"
     git_committer_name: str = "gitea-actions[bot]"
     git_committer_email: str = "gitea-actions[bot]@noreply.gitea.io"
+    # Extra environment for git commands, e.g. GitService.git_env_overrides.
+    # Files it refers to, like GitService's signing keys, must outlive this
+    # service: keep their owner referenced for as long as it runs git.
+    git_env: dict[str, str] = field(default_factory=dict)
+    # Repository that worktrees are created from
+    repo_path: Path = field(default_factory=Path)
+
+    # Serializes changes to the repository's shared worktree administration
+    # files when inputs are updated concurrently
+    _worktree_lock: threading.Lock = field(
+        default_factory=threading.Lock,
+        init=False,
+        repr=False,
+        compare=False,
+    )
 
     def __post_init__(self) -> None:
         """Post-initialization processing."""
@@ -96,6 +112,9 @@ class GiteaService:
     def worktree(self, branch_name: str) -> Iterator[Path]:
         """Context manager for creating and cleaning up a git worktree.
 
+        Each call gets its own temporary directory, so worktrees for different
+        branches can be used concurrently.
+
         Args:
             branch_name: Name of the branch to create worktree for
 
@@ -109,17 +128,15 @@ class GiteaService:
                 worktree_path = Path(temp_dir) / branch_name
 
                 # Create worktree
-                subprocess.run(
-                    [
-                        "git",
+                with self._worktree_lock:
+                    self._run_git(
                         "worktree",
                         "add",
                         str(worktree_path),
                         "-b",
                         branch_name,
-                    ],
-                    check=True,
-                )
+                        cwd=self.repo_path,
+                    )
 
                 logger.info(
                     "Created worktree for branch %s at %s",
@@ -130,14 +147,54 @@ class GiteaService:
         finally:
             if worktree_path:
                 # Clean up worktree
-                with contextlib.suppress(subprocess.SubprocessError, OSError):
+                with (
+                    self._worktree_lock,
+                    contextlib.suppress(subprocess.SubprocessError, OSError),
+                ):
                     subprocess.run(
                         ["git", "worktree", "remove", "--force", str(worktree_path)],
+                        cwd=self.repo_path,
+                        env=self._git_env(),
                         check=False,
                         capture_output=True,
                     )
                 logger.info("Cleaned up worktree at %s", worktree_path)
 
+    def _git_env(self) -> dict[str, str]:
+        """Build the environment for running git commands."""
+        return {**os.environ, **self.git_env}
+
+    def _run_git(
+        self,
+        *args: str,
+        cwd: Path | None = None,
+        env: dict[str, str] | None = None,
+    ) -> None:
+        """Run a git command, discarding its output unless it fails.
+
+        Args:
+            *args: Arguments to pass to git
+            cwd: Directory to run git in
+            env: Environment for git, defaults to the git environment
+
+        Raises:
+            GiteaServiceError: If the git command fails
+
+        """
+        try:
+            subprocess.run(
+                ["git", *args],
+                cwd=cwd,
+                env=env if env is not None else self._git_env(),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                check=True,
+            )
+        except subprocess.CalledProcessError as e:
+            msg = f"git {args[0]} failed: {e.stderr.strip()}"
+            raise GiteaServiceError(msg) from e
+
     def _make_request(
         self,
         method: str,
@@ -223,17 +280,14 @@ class GiteaService:
 
         """
         # Add all changes in the worktree
-        subprocess.run(
-            ["git", "add", "."],
-            cwd=worktree_path,
-            check=True,
-        )
+        self._run_git("add", ".", cwd=worktree_path)
 
         # Check if there are changes to commit
         result = subprocess.run(
             ["git", "diff", "--cached", "--quiet"],
             check=False,
             cwd=worktree_path,
+            env=self._git_env(),
             capture_output=True,
         )
 
@@ -245,7 +299,7 @@ class GiteaService:
             return False
 
         # Commit changes
-        env = os.environ.copy()
+        env = self._git_env()
         env.update(
             {
                 "GIT_AUTHOR_NAME": self.git_author_name,
@@ -255,19 +309,10 @@ class GiteaService:
             }
         )
 
-        subprocess.run(
-            ["git", "commit", "-m", commit_message],
-            cwd=worktree_path,
-            env=env,
-            check=True,
-        )
+        self._run_git("commit", "-m", commit_message, cwd=worktree_path, env=env)
 
         # Push to remote
-        subprocess.run(
-            ["git", "push", "origin", "--force", branch_name],
-            cwd=worktree_path,
-            check=True,
-        )
+        self._run_git("push", "origin", "--force", branch_name, cwd=worktree_path)
 
         logger.info("Committed and pushed changes to branch: %s", branch_name)
         return True
@@ -0,0 +1,55 @@
+"""Helpers for setting up git repositories in tests."""
+
+import io
+from pathlib import Path
+
+from dulwich import porcelain
+from dulwich.repo import Repo
+
+DEFAULT_BRANCH = b"refs/heads/main"
+
+
+def make_repo_with_remote(
+    path: Path,
+    *,
+    author: str = "Test User",
+    email: str = "test@example.com",
+) -> Path:
+    """Commit everything in a directory and push it to a new bare remote.
+
+    The repository is built in-process with dulwich rather than by spawning a
+    git process for each step.
+
+    Args:
+        path: Directory holding the files for the initial commit
+        author: Name used for the initial commit's author and committer
+        email: Email used for the initial commit's author and committer
+
+    Returns:
+        Path to the bare remote, created next to the repository
+
+    """
+    remote_dir = path.parent / f"remote-{path.name}.git"
+    identity = f"{author} <{email}>".encode()
+
+    with Repo.init_bare(str(remote_dir), mkdir=True) as remote:
+        remote.refs.set_symbolic_ref(b"HEAD", DEFAULT_BRANCH)
+
+    with porcelain.init(str(path)) as repo:
+        repo.refs.set_symbolic_ref(b"HEAD", DEFAULT_BRANCH)
+        files = [
+            str(file)
+            for file in sorted(path.rglob("*"))
+            if file.is_file() and ".git" not in file.relative_to(path).parts
+        ]
+        porcelain.add(repo, paths=files)
+        porcelain.commit(
+            repo,
+            message=b"Initial commit",
+            author=identity,
+            committer=identity,
+        )
+        porcelain.remote_add(repo, "origin", str(remote_dir))
+        porcelain.push(repo, str(remote_dir), DEFAULT_BRANCH, errstream=io.BytesIO())
+
+    return remote_dir
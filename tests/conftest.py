@@ -0,0 +1,80 @@
+"""Shared pytest configuration for update-flake-inputs tests."""
+
+import os
+import shutil
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+# Resolved once so fixture paths never depend on the working directory
+FIXTURES_PATH = Path(__file__).resolve().parent / "fixtures"
+
+# Fixture files that tests copy into their own repositories
+FIXTURE_BLOB_NAMES = (
+    "minimal/flake.nix",
+    "minimal/flake.lock",
+    "up-to-date/flake.nix",
+)
+
+# RAM-backed filesystem used for pytest's temporary directories when available
+SHM_PATH = Path("/dev/shm")  # noqa: S108 - each run gets a private mkdtemp dir under it
+
+# Base temporary directory this process created on the RAM disk, if any
+SHM_BASETEMP_KEY = pytest.StashKey[Path]()
+
+# Keep git from taking optional locks, prompting, or reading user and system
+# configuration in the throwaway repositories the tests create
+GIT_TEST_ENV = {
+    "GIT_OPTIONAL_LOCKS": "0",
+    "GIT_TERMINAL_PROMPT": "0",
+    "GIT_CONFIG_GLOBAL": os.devnull,
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config: pytest.Config) -> None:
+    """Keep pytest's temporary directories on a RAM disk when one is available.
+
+    Only pytest's base temporary directory moves, so tmp_path and friends live
+    on /dev/shm while code under test, such as GiteaService's worktrees, keeps
+    using the default temporary directory. Each run gets its own directory so
+    concurrent runs don't clear each other's files. Runs given an explicit
+    --basetemp, including pytest-xdist workers, are left alone.
+    """
+    if config.option.basetemp is not None:
+        return
+    if SHM_PATH.is_dir() and os.access(SHM_PATH, os.W_OK | os.X_OK):
+        basetemp = Path(tempfile.mkdtemp(prefix="pytest-", dir=SHM_PATH))
+        config.stash[SHM_BASETEMP_KEY] = basetemp
+        config.option.basetemp = str(basetemp)
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    """Free the RAM disk directory created for this run."""
+    basetemp = config.stash.get(SHM_BASETEMP_KEY, None)
+    if basetemp is not None:
+        shutil.rmtree(basetemp, ignore_errors=True)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def git_test_env() -> Iterator[None]:
+    """Run every git command in the session with a minimal, isolated config."""
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in GIT_TEST_ENV.items():
+            mp.setenv(name, value)
+        yield
+
+
+@pytest.fixture(scope="session")
+def fixtures_path() -> Path:
+    """Get path to test fixtures."""
+    return FIXTURES_PATH
+
+
+@pytest.fixture(scope="session")
+def fixture_blobs() -> dict[str, bytes]:
+    """Read the fixture files tests copy into their repositories once per session."""
+    return {name: (FIXTURES_PATH / name).read_bytes() for name in FIXTURE_BLOB_NAMES}
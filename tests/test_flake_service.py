@@ -1,8 +1,7 @@
 """Tests for FlakeService based on TypeScript test scenarios."""
 
+import fnmatch
 import json
-import os
-import shutil
 import subprocess
 import tempfile
 from pathlib import Path
@@ -20,11 +19,6 @@ class TestFlakeService:
         """Create a FlakeService instance."""
         return FlakeService()
 
-    @pytest.fixture
-    def fixtures_path(self) -> Path:
-        """Get path to test fixtures."""
-        return Path(__file__).parent / "fixtures"
-
     def test_discover_flake_files(
         self,
         flake_service: FlakeService,
@@ -155,7 +149,7 @@ class TestFlakeService:
     def test_update_flake_input(
         self,
         flake_service: FlakeService,
-        fixtures_path: Path,
+        fixture_blobs: dict[str, bytes],
     ) -> None:
         """Test updating a flake input and modifying the lock file."""
         # Create a temporary directory for the test
@@ -163,29 +157,40 @@ class TestFlakeService:
             temp_path = Path(temp_dir)
 
             # Copy minimal flake to temp directory
-            shutil.copy(
-                fixtures_path / "minimal" / "flake.nix",
-                temp_path / "flake.nix",
-            )
-            shutil.copy(
-                fixtures_path / "minimal" / "flake.lock",
-                temp_path / "flake.lock",
-            )
+            (temp_path / "flake.nix").write_bytes(fixture_blobs["minimal/flake.nix"])
+            (temp_path / "flake.lock").write_bytes(fixture_blobs["minimal/flake.lock"])
 
             # Initialize git repo in temp directory
-            subprocess.run(["git", "init"], cwd=temp_path, check=True)
-            subprocess.run(["git", "add", "."], cwd=temp_path, check=True)
             subprocess.run(
-                ["git", "commit", "-m", "Initial commit"],
+                ["git", "init", "--quiet"],
                 cwd=temp_path,
                 check=True,
-                env={
-                    **os.environ,
-                    "GIT_AUTHOR_NAME": "Test User",
-                    "GIT_AUTHOR_EMAIL": "test@example.com",
-                    "GIT_COMMITTER_NAME": "Test User",
-                    "GIT_COMMITTER_EMAIL": "test@example.com",
-                },
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                ["git", "add", "."],
+                cwd=temp_path,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                [
+                    "git",
+                    "-c",
+                    "user.name=Test User",
+                    "-c",
+                    "user.email=test@example.com",
+                    "commit",
+                    "--quiet",
+                    "-m",
+                    "Initial commit",
+                ],
+                cwd=temp_path,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
             )
 
             # Get the original lock file content
@@ -216,7 +221,7 @@ class TestFlakeService:
     def test_update_nonexistent_input(
         self,
         flake_service: FlakeService,
-        fixtures_path: Path,
+        fixture_blobs: dict[str, bytes],
         caplog: pytest.LogCaptureFixture,
     ) -> None:
         """Test handling updating a non-existent input gracefully."""
@@ -225,29 +230,40 @@ class TestFlakeService:
             temp_path = Path(temp_dir)
 
             # Copy minimal flake to temp directory
-            shutil.copy(
-                fixtures_path / "minimal" / "flake.nix",
-                temp_path / "flake.nix",
-            )
-            shutil.copy(
-                fixtures_path / "minimal" / "flake.lock",
-                temp_path / "flake.lock",
-            )
+            (temp_path / "flake.nix").write_bytes(fixture_blobs["minimal/flake.nix"])
+            (temp_path / "flake.lock").write_bytes(fixture_blobs["minimal/flake.lock"])
 
             # Initialize git repo
-            subprocess.run(["git", "init"], cwd=temp_path, check=True)
-            subprocess.run(["git", "add", "."], cwd=temp_path, check=True)
             subprocess.run(
-                ["git", "commit", "-m", "Initial commit"],
+                ["git", "init", "--quiet"],
+                cwd=temp_path,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                ["git", "add", "."],
+                cwd=temp_path,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                [
+                    "git",
+                    "-c",
+                    "user.name=Test User",
+                    "-c",
+                    "user.email=test@example.com",
+                    "commit",
+                    "--quiet",
+                    "-m",
+                    "Initial commit",
+                ],
                 cwd=temp_path,
                 check=True,
-                env={
-                    **os.environ,
-                    "GIT_AUTHOR_NAME": "Test User",
-                    "GIT_AUTHOR_EMAIL": "test@example.com",
-                    "GIT_COMMITTER_NAME": "Test User",
-                    "GIT_COMMITTER_EMAIL": "test@example.com",
-                },
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
             )
 
             original_lock_content = (temp_path / "flake.lock").read_text()
@@ -263,3 +279,131 @@ class TestFlakeService:
             assert any(
                 "Failed to update input nonexistent" in record.message for record in caplog.records
             )
+
+
+# Paths checked against exclude patterns by the pattern union tests
+CANDIDATE_PATHS = (
+    "flake.nix",
+    "a/flake.nix",
+    "b/flake.nix",
+    "a/b/flake.nix",
+    "vendor/x/flake.nix",
+    "nested/a/flake.nix",
+    "flake.lock",
+)
+
+
+def make_flake(repo_path: Path, directory: str) -> None:
+    """Create a locked flake in a directory of a repository."""
+    flake_dir = repo_path / directory
+    flake_dir.mkdir(parents=True, exist_ok=True)
+    (flake_dir / "flake.nix").write_text("{ outputs = { self }: { }; }\n")
+    (flake_dir / "flake.lock").write_text("{}\n")
+
+
+class TestFlakeDiscovery:
+    """Discovery tests that stub out nix, exercising only the directory walk."""
+
+    @pytest.fixture
+    def repo_path(self, tmp_path: Path) -> Path:
+        """Create a repository with a locked root flake."""
+        repo_path = tmp_path / "repo"
+        make_flake(repo_path, ".")
+        return repo_path
+
+    @pytest.fixture
+    def flake_service(self, repo_path: Path, monkeypatch: pytest.MonkeyPatch) -> FlakeService:
+        """Create a FlakeService whose flakes all have a single input."""
+        monkeypatch.setattr(FlakeService, "get_flake_inputs", lambda _self, _flake: ["input"])
+        return FlakeService(repo_path=repo_path)
+
+    def discovered(self, flake_service: FlakeService, exclude_patterns: str = "") -> list[str]:
+        """Return the paths of the discovered flakes."""
+        return sorted(f.file_path for f in flake_service.discover_flake_files(exclude_patterns))
+
+    def test_ignored_directories_are_skipped(
+        self,
+        flake_service: FlakeService,
+        repo_path: Path,
+    ) -> None:
+        """Test that flakes under node_modules, .git and __pycache__ are not found."""
+        make_flake(repo_path, "node_modules/x")
+        make_flake(repo_path, ".git/x")
+        make_flake(repo_path, "pkgs/__pycache__")
+        make_flake(repo_path, "pkgs/tool")
+
+        assert self.discovered(flake_service) == ["flake.nix", "pkgs/tool/flake.nix"]
+
+    def test_recursive_directory_exclude(
+        self,
+        flake_service: FlakeService,
+        repo_path: Path,
+    ) -> None:
+        """Test that a dir/** pattern excludes every flake below that directory."""
+        make_flake(repo_path, "vendor")
+        make_flake(repo_path, "vendor/a")
+        make_flake(repo_path, "vendor/a/b")
+        make_flake(repo_path, "vendored")
+
+        assert self.discovered(flake_service, "vendor/**") == ["flake.nix", "vendored/flake.nix"]
+
+    def test_wildcard_directory_exclude_keeps_root_flake(
+        self,
+        flake_service: FlakeService,
+        repo_path: Path,
+    ) -> None:
+        """Test that */* excludes flakes in subdirectories but not the root flake."""
+        make_flake(repo_path, "a")
+        make_flake(repo_path, "a/b")
+
+        assert self.discovered(flake_service, "*/*") == ["flake.nix"]
+
+    def test_symlinked_directories_are_not_followed(
+        self,
+        flake_service: FlakeService,
+        repo_path: Path,
+        tmp_path: Path,
+    ) -> None:
+        """Test that flakes reached only through a symlink, like nix's result, are skipped."""
+        make_flake(tmp_path, "store/package")
+        (repo_path / "result").symlink_to(tmp_path / "store", target_is_directory=True)
+
+        assert self.discovered(flake_service) == ["flake.nix"]
+
+    @pytest.mark.parametrize(
+        "patterns",
+        [
+            ["a/flake.nix"],
+            ["a/flake.nix", "b/flake.nix"],
+            ["**/flake.nix"],
+            ["*/flake.nix", "vendor/**"],
+            ["a/*", "flake.nix"],
+            ["[ab]/flake.nix", "nested/?/flake.nix"],
+        ],
+    )
+    def test_compiled_patterns_match_like_fnmatch(
+        self,
+        flake_service: FlakeService,
+        patterns: list[str],
+    ) -> None:
+        """Test that the union regex matches the same paths as fnmatch on each pattern."""
+        compiled = flake_service._compile_patterns(patterns)  # noqa: SLF001
+
+        assert compiled is not None
+        for path in CANDIDATE_PATHS:
+            expected = any(fnmatch.fnmatch(path, pattern) for pattern in patterns)
+            assert bool(compiled.match(path)) == expected, path
+
+    def test_no_patterns_compile_to_none(self, flake_service: FlakeService) -> None:
+        """Test that an empty pattern list compiles to no regex at all."""
+        assert flake_service._compile_patterns([]) is None  # noqa: SLF001
+
+    def test_exclude_separators(self, flake_service: FlakeService, repo_path: Path) -> None:
+        """Test that whitespace and empty entries around commas are ignored."""
+        for directory in ("a", "b", "c"):
+            make_flake(repo_path, directory)
+
+        assert self.discovered(flake_service, " a/flake.nix , ,b/flake.nix,") == [
+            "c/flake.nix",
+            "flake.nix",
+        ]
@@ -1,5 +1,6 @@
 """Tests for GitService."""
 
+import os
 import pytest
 import re
 import subprocess
@@ -8,19 +9,23 @@ import tempfile
 from pathlib import Path
 from update_flake_inputs.git_service import GitService
 
+# Permissions ssh requires on a private key before it will use it
+PRIVATE_KEY_MODE = 0o600
 
-class TestGitService:
-    @pytest.fixture
-    def fixtures_path(self) -> Path:
-        """Get path to test fixtures."""
-        return Path(__file__).parent / "fixtures"
 
+class TestGitService:
     def test_no_change_when_signing_key_not_provided(
         self,
     ) -> None:
         """Test that config is not changed when no key is provided"""
         with tempfile.TemporaryDirectory(prefix="test-git-service") as temp_dir:
-            subprocess.run(["git", "init", "-b", "main"], cwd=temp_dir, check=True)
+            subprocess.run(
+                ["git", "init", "--quiet", "-b", "main"],
+                cwd=temp_dir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
 
             cp = subprocess.run(["git", "config", "get", "--local", "user.signingkey"], cwd=temp_dir, check=False)
             assert cp.returncode == 1
@@ -34,8 +39,8 @@ class TestGitService:
             git_service = GitService(
                 private_key=None,
                 public_key=None,
-                path=temp_dir,
             )
+            assert git_service.git_env_overrides == {}
 
             cp = subprocess.run(["git", "config", "get", "--local", "user.signingkey"], cwd=temp_dir, check=False)
             assert cp.returncode == 1
@@ -57,7 +62,13 @@ class TestGitService:
         allowed_signers_file = (fixtures_path / "ssh-key" / "allowed_signers")
 
         with tempfile.TemporaryDirectory(prefix="test-git-service") as temp_dir:
-            subprocess.run(["git", "init", "-b", "main"], cwd=temp_dir, check=True)
+            subprocess.run(
+                ["git", "init", "--quiet", "-b", "main"],
+                cwd=temp_dir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
 
             cp = subprocess.run(["git", "config", "get", "--local", "user.signingkey"], cwd=temp_dir, check=False)
             assert cp.returncode == 1
@@ -71,29 +82,93 @@ class TestGitService:
             git_service = GitService(
                 private_key=key,
                 public_key=pubkey,
-                path=temp_dir,
             )
 
+            # Signing is configured through the environment, not the repository
             cp = subprocess.run(["git", "config", "get", "--local", "user.signingkey"], cwd=temp_dir, check=False)
-            assert cp.returncode == 0
+            assert cp.returncode == 1
 
             cp = subprocess.run(["git", "config", "get", "--local", "gpg.format"], cwd=temp_dir, check=False)
-            assert cp.returncode == 0
+            assert cp.returncode == 1
 
             cp = subprocess.run(["git", "config", "get", "--local", "commit.gpgsign"], cwd=temp_dir, check=False)
+            assert cp.returncode == 1
+
+            git_env = {**os.environ, **git_service.git_env_overrides}
+
+            cp = subprocess.run(
+                ["git", "config", "get", "user.signingkey"],
+                cwd=temp_dir,
+                env=git_env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            assert cp.returncode == 0
+            signing_key = Path(cp.stdout.strip())
+            assert signing_key.is_file()
+            private_key = signing_key.with_suffix("")
+            assert private_key.is_file()
+            assert private_key.stat().st_mode & 0o777 == PRIVATE_KEY_MODE
+
+            cp = subprocess.run(
+                ["git", "config", "get", "gpg.format"],
+                cwd=temp_dir,
+                env=git_env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            assert cp.returncode == 0
+            assert cp.stdout.strip() == "ssh"
+
+            cp = subprocess.run(
+                ["git", "config", "get", "commit.gpgsign"],
+                cwd=temp_dir,
+                env=git_env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
             assert cp.returncode == 0
+            assert cp.stdout.strip() == "true"
 
             with open(Path(temp_dir) / "change.txt", 'w') as file:
                 file.write("Signed commit\n")
 
-            subprocess.run(["git", "add", "change.txt"], cwd=temp_dir, check=True)
-            subprocess.run(["git", "commit", "-m", "Signed commit"], cwd=temp_dir, check=True)
+            subprocess.run(
+                ["git", "add", "change.txt"],
+                cwd=temp_dir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            subprocess.run(
+                [
+                    "git",
+                    "-c",
+                    "user.name=Test User",
+                    "-c",
+                    "user.email=test@example.com",
+                    "commit",
+                    "--quiet",
+                    "-m",
+                    "Signed commit",
+                ],
+                cwd=temp_dir,
+                env=git_env,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
 
 
             subprocess.run(
                 ["git", "config", "set", "--local", "gpg.ssh.allowedsignersfile", str(allowed_signers_file)],
                 cwd=temp_dir,
-                check=True
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
             )
             cp = subprocess.run(
                 ["git", "log", "--show-signature", "-n", "1", "--pretty='format:%G?'"],
@@ -104,3 +179,20 @@ class TestGitService:
 
             signature_status = cp.stdout.decode('UTF-8').strip()
             assert re.search(r"'format:G'", signature_status)
+
+    def test_empty_git_config_count_is_treated_as_zero(
+        self,
+        fixtures_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that an empty GIT_CONFIG_COUNT in the environment counts as no entries."""
+        monkeypatch.setenv("GIT_CONFIG_COUNT", "")
+
+        git_service = GitService(
+            private_key=(fixtures_path / "ssh-key" / "git-signing-key").read_text().strip(),
+            public_key=(fixtures_path / "ssh-key" / "git-signing-key.pub").read_text().strip(),
+        )
+
+        overrides = git_service.git_env_overrides
+        assert overrides["GIT_CONFIG_COUNT"] == "3"
+        assert overrides["GIT_CONFIG_KEY_0"] == "user.signingkey"
@@ -1,18 +1,36 @@
 """Integration tests for process_flake_updates based on TypeScript test scenarios."""
 
-import os
+import concurrent.futures
+import contextlib
 import shutil
 import subprocess
+import threading
+from collections.abc import Iterator
 from dataclasses import dataclass, field
 from pathlib import Path
 
 import pytest
+from dulwich.objects import Commit
+from dulwich.repo import Repo
 
+from tests._gitsetup import make_repo_with_remote
 from update_flake_inputs.cli import process_flake_updates
-from update_flake_inputs.flake_service import FlakeService
+from update_flake_inputs.exceptions import FlakeServiceError, GiteaServiceError
+from update_flake_inputs.flake_service import Flake, FlakeService
 from update_flake_inputs.gitea_service import GiteaService
 
 
+@dataclass
+class PrAttempt:
+    """A pull request that MockGiteaService was asked to create."""
+
+    branch_name: str
+    base_branch: str
+    title: str
+    body: str
+    auto_merge: bool
+
+
 @dataclass
 class MockGiteaService(GiteaService):
     """Mock version of GiteaService that skips API calls."""
@@ -22,7 +40,7 @@ class MockGiteaService(GiteaService):
     token: str = "test-token"  # noqa: S105
     owner: str = "test-owner"
     repo: str = "test-repo"
-    pr_creation_attempts: list[dict[str, str]] = field(default_factory=list)
+    pr_creation_attempts: list[PrAttempt] = field(default_factory=list)
 
     def __post_init__(self) -> None:
         """Skip token validation in tests."""
@@ -43,140 +61,98 @@ class MockGiteaService(GiteaService):
     ) -> None:
         """Record PR creation attempt without making actual API call."""
         self.pr_creation_attempts.append(
-            {
-                "branch_name": branch_name,
-                "base_branch": base_branch,
-                "title": title,
-                "body": body,
-                "auto_merge": str(auto_merge),
-            }
+            PrAttempt(
+                branch_name=branch_name,
+                base_branch=base_branch,
+                title=title,
+                body=body,
+                auto_merge=auto_merge,
+            )
         )
 
 
-class TestProcessFlakeUpdates:
-    """Integration tests for process_flake_updates."""
+@dataclass
+class StubFlakeService(FlakeService):
+    """FlakeService with fixed flakes whose input updates only rewrite flake.lock."""
 
-    @pytest.fixture
-    def fixtures_path(self) -> Path:
-        """Get path to test fixtures."""
-        return Path(__file__).parent / "fixtures"
+    flakes: list[Flake] = field(default_factory=list)
+    failures: dict[str, BaseException] = field(default_factory=dict)
+    # When given, successful updates block until it is set
+    release: threading.Event | None = None
+    updated_inputs: list[str] = field(default_factory=list)
 
-    def test_with_up_to_date_flake_input(
+    def discover_flake_files(self, exclude_patterns: str = "") -> list[Flake]:  # noqa: ARG002
+        """Return the configured flakes."""
+        return self.flakes
+
+    def update_flake_input(
         self,
-        tmp_path: Path,
-        fixtures_path: Path,
-        caplog: pytest.LogCaptureFixture,
+        input_name: str,
+        flake_file: str,
+        work_dir: str | None = None,
     ) -> None:
-        """Test that no PR is created when flake input is already up-to-date."""
-        # Create a flake with a local input that won't have updates
-        flake_content = (fixtures_path / "up-to-date" / "flake.nix").read_text()
-
-        # Replace relative path with absolute path
-        absolute_path = fixtures_path / "local-flake-repo"
-        patched_content = flake_content.replace(
-            "path:../local-flake-repo",
-            f"path:{absolute_path}",
-        )
-
-        (tmp_path / "flake.nix").write_text(patched_content)
-
-        # Generate lock file
-        subprocess.run(["nix", "flake", "lock"], cwd=tmp_path, check=True)
-
-        # Initialize git repo
-        subprocess.run(["git", "init", "-b", "main"], cwd=tmp_path, check=True)
-        subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Initial commit"],
-            cwd=tmp_path,
-            check=True,
-            env={
-                **os.environ,
-                "GIT_AUTHOR_NAME": "Test User",
-                "GIT_AUTHOR_EMAIL": "test@example.com",
-                "GIT_COMMITTER_NAME": "Test User",
-                "GIT_COMMITTER_EMAIL": "test@example.com",
-            },
-        )
-
-        # Add remote
-        remote_dir = tmp_path.parent / f"remote-{tmp_path.name}.git"
-        remote_dir.mkdir()
-        subprocess.run(["git", "init", "--bare"], cwd=remote_dir, check=True)
-        subprocess.run(
-            ["git", "remote", "add", "origin", str(remote_dir)],
-            cwd=tmp_path,
-            check=True,
-        )
-        subprocess.run(
-            ["git", "push", "-u", "origin", "main"],
-            cwd=tmp_path,
-            check=True,
-        )
-
-        # Change to test directory
-        original_cwd = Path.cwd()
-        os.chdir(tmp_path)
-
-        try:
-            # Create test services
-            flake_service = FlakeService()
-            test_gitea_service = MockGiteaService()
+        """Fail for configured inputs, otherwise change the input's lock file."""
+        if input_name in self.failures:
+            raise self.failures[input_name]
+        if self.release is not None:
+            assert self.release.wait(timeout=30), f"{input_name} was never released"
+        self.updated_inputs.append(input_name)
+        lock_file = Path(work_dir or self.repo_path) / Path(flake_file).parent / "flake.lock"
+        lock_file.write_text(input_name)
 
-            # Set log level for capturing
-            caplog.set_level("INFO")
-
-            # Process updates
-            process_flake_updates(
-                flake_service,
-                test_gitea_service,
-                "",
-                "main",
-                "",
-                auto_merge=False,
-            )
 
-            # Verify NO pull request was created
-            assert len(test_gitea_service.pr_creation_attempts) == 0
+class ReleasingThreadPoolExecutor(concurrent.futures.ThreadPoolExecutor):
+    """Thread pool that sets an event once its queued work has been cancelled."""
 
-            # Verify we detected no changes
-            assert any(
-                "No changes for input local-test in flake.nix" in record.message
-                for record in caplog.records
-            )
+    release = threading.Event()
 
-            # Verify we're still on main branch
-            result = subprocess.run(
-                ["git", "branch", "--show-current"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            assert result.stdout.strip() == "main"
-
-            # Verify no new commits on main
-            result = subprocess.run(
-                ["git", "log", "--oneline"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            commits = result.stdout.strip().split("\n")
-            single_commit = 1
-            assert len(commits) == single_commit
-            assert "Initial commit" in commits[0]
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:  # noqa: FBT001, FBT002
+        """Shut down the pool, releasing blocked work after cancelling the queue."""
+        super().shutdown(wait=False, cancel_futures=cancel_futures)
+        if cancel_futures:
+            self.release.set()
+        super().shutdown(wait=wait)
 
-        finally:
-            os.chdir(original_cwd)
 
-    def test_with_updatable_flake_input(
+@dataclass
+class StubWorktreeGiteaService(MockGiteaService):
+    """MockGiteaService that uses plain directories instead of git worktrees."""
+
+    # Whether the worktree checkout contains the flake's lock file
+    lock_in_worktree: bool = True
+
+    @contextlib.contextmanager
+    def worktree(self, branch_name: str) -> Iterator[Path]:
+        """Yield a fresh directory holding an unchanged flake.lock."""
+        worktree_path = self.repo_path / branch_name
+        worktree_path.mkdir()
+        if self.lock_in_worktree:
+            (worktree_path / "flake.lock").write_text("")
+        yield worktree_path
+
+    def commit_changes(
         self,
-        tmp_path: Path,
-        fixtures_path: Path,
-    ) -> None:
-        """Test PR creation when flake input has available updates."""
-        # Create a flake with flake-utils that can be updated
-        flake_content = """{
+        branch_name: str,  # noqa: ARG002
+        commit_message: str,  # noqa: ARG002
+        worktree_path: Path,  # noqa: ARG002
+    ) -> bool:
+        """Report every update as committed."""
+        return True
+
+
+def branch_history(repo: Repo, ref: bytes) -> list[Commit]:
+    """Follow the first-parent history of a ref in-process, newest first."""
+    commit = repo[repo.refs[ref]]
+    assert isinstance(commit, Commit)
+    commits = [commit]
+    while commit.parents:
+        commit = repo[commit.parents[0]]
+        assert isinstance(commit, Commit)
+        commits.append(commit)
+    return commits
+
+
+UPDATABLE_FLAKE_CONTENT = """{
   inputs = {
     flake-utils.url = "github:numtide/flake-utils";
   };
@@ -186,293 +162,305 @@ class TestProcessFlakeUpdates:
   };
 }"""
 
-        (tmp_path / "flake.nix").write_text(flake_content)
 
-        # Copy old lock file from minimal fixture
-        shutil.copy(
-            fixtures_path / "minimal" / "flake.lock",
-            tmp_path / "flake.lock",
-        )
+def copy_repo_template(template: Path, tmp_path: Path) -> None:
+    """Copy a prepared repository for a single test.
 
-        # Initialize git repo
-        subprocess.run(["git", "init", "-b", "main"], cwd=tmp_path, check=True)
-        subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Initial commit"],
-            cwd=tmp_path,
-            check=True,
-            env={
-                **os.environ,
-                "GIT_AUTHOR_NAME": "Test User",
-                "GIT_AUTHOR_EMAIL": "test@example.com",
-                "GIT_COMMITTER_NAME": "Test User",
-                "GIT_COMMITTER_EMAIL": "test@example.com",
-            },
-        )
+    The copy keeps the template's origin, so every test in the session pushes
+    to the same bare remote instead of getting a copy of its own.
+    """
+    shutil.copytree(template / "repo", tmp_path, symlinks=True, dirs_exist_ok=True)
 
-        # Add remote
-        remote_dir = tmp_path.parent / f"remote-{tmp_path.name}.git"
-        remote_dir.mkdir()
-        subprocess.run(["git", "init", "--bare"], cwd=remote_dir, check=True)
-        subprocess.run(
-            ["git", "remote", "add", "origin", str(remote_dir)],
-            cwd=tmp_path,
-            check=True,
-        )
-        subprocess.run(
-            ["git", "push", "-u", "origin", "main"],
-            cwd=tmp_path,
-            check=True,
-        )
 
-        # Change to test directory
-        original_cwd = Path.cwd()
-        os.chdir(tmp_path)
+@pytest.fixture(scope="session")
+def prepared_repo_template(
+    tmp_path_factory: pytest.TempPathFactory,
+    fixture_blobs: dict[str, bytes],
+) -> Path:
+    """Build a repository with an updatable flake input, and a shared remote, once per session."""
+    template = tmp_path_factory.mktemp("repo-template")
+    repo_dir = template / "repo"
+    repo_dir.mkdir()
 
-        try:
-            # Create test services
-            flake_service = FlakeService()
-            test_gitea_service = MockGiteaService()
+    (repo_dir / "flake.nix").write_text(UPDATABLE_FLAKE_CONTENT)
 
-            # Process updates
-            process_flake_updates(
-                flake_service,
-                test_gitea_service,
-                "",
-                "main",
-                "",
-                auto_merge=False,
-            )
+    # Copy old lock file from minimal fixture
+    (repo_dir / "flake.lock").write_bytes(fixture_blobs["minimal/flake.lock"])
 
-            # Verify pull request was created
-            assert len(test_gitea_service.pr_creation_attempts) == 1
+    make_repo_with_remote(repo_dir)
+    return template
 
-            pr_attempt = test_gitea_service.pr_creation_attempts[0]
-            assert pr_attempt["branch_name"] == "update-flake-utils"
-            assert pr_attempt["base_branch"] == "main"
-            assert pr_attempt["title"] == "Update flake-utils"
-            assert "updates the `flake-utils` input" in pr_attempt["body"]
 
-            # Verify PR was created with correct information
+@pytest.fixture
+def flake_with_updatable_input(tmp_path: Path, prepared_repo_template: Path) -> Path:
+    """Copy the prepared repository with an updatable input for a single test.
 
-            # Verify we're back on main branch
-            result = subprocess.run(
-                ["git", "branch", "--show-current"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            assert result.stdout.strip() == "main"
-
-            # Verify the update branch exists and has the commit
-            result = subprocess.run(
-                ["git", "log", "--oneline", "update-flake-utils"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            commits = result.stdout.strip().split("\n")
-            expected_commits = 2
-            assert len(commits) == expected_commits
-            assert "Update flake-utils" in commits[0]
-            assert "Initial commit" in commits[1]
+    Returns:
+        Path to the test's repository, which pushes to the shared remote
 
-        finally:
-            os.chdir(original_cwd)
+    """
+    copy_repo_template(prepared_repo_template, tmp_path)
+    return tmp_path
 
-    def test_custom_git_author_committer(
+
+@pytest.fixture(scope="session")
+def up_to_date_flake(
+    tmp_path_factory: pytest.TempPathFactory,
+    fixtures_path: Path,
+    fixture_blobs: dict[str, bytes],
+) -> tuple[str, bytes]:
+    """Lock a flake with a local path input once per session.
+
+    The lock records the input's narHash and an mtime-derived lastModified, so it
+    cannot be checked in; it is generated here and written by each test instead.
+    """
+    flake_content = fixture_blobs["up-to-date/flake.nix"].decode()
+
+    # Replace relative path with absolute path
+    absolute_path = fixtures_path / "local-flake-repo"
+    patched_content = flake_content.replace(
+        "path:../local-flake-repo",
+        f"path:{absolute_path}",
+    )
+
+    flake_dir = tmp_path_factory.mktemp("up-to-date")
+    (flake_dir / "flake.nix").write_text(patched_content)
+    # The only input is a local path, so locking never needs the network
+    subprocess.run(["nix", "flake", "lock", "--offline"], cwd=flake_dir, check=True)
+    return patched_content, (flake_dir / "flake.lock").read_bytes()
+
+
+class TestProcessFlakeUpdates:
+    """Integration tests for process_flake_updates."""
+
+    def test_with_up_to_date_flake_input(
         self,
         tmp_path: Path,
-        fixtures_path: Path,
+        up_to_date_flake: tuple[str, bytes],
+        caplog: pytest.LogCaptureFixture,
     ) -> None:
-        """Test that custom git author/committer configuration is used."""
-        # Create a flake with flake-utils
-        flake_content = """{
-  inputs = {
-    flake-utils.url = "github:numtide/flake-utils";
-  };
-
-  outputs = { self, flake-utils }: {
-    # Test flake
-  };
-}"""
-
+        """Test that no PR is created when flake input is already up-to-date."""
+        # Create a flake with a local input that won't have updates
+        flake_content, lock_content = up_to_date_flake
         (tmp_path / "flake.nix").write_text(flake_content)
-
-        # Copy old lock file from minimal fixture
-        shutil.copy(
-            fixtures_path / "minimal" / "flake.lock",
-            tmp_path / "flake.lock",
+        (tmp_path / "flake.lock").write_bytes(lock_content)
+
+        # Initialize git repo and remote
+        make_repo_with_remote(tmp_path)
+
+        # Create test services
+        flake_service = FlakeService(repo_path=tmp_path)
+        test_gitea_service = MockGiteaService(repo_path=tmp_path)
+
+        # Set log level for capturing
+        caplog.set_level("INFO")
+
+        # Process updates
+        process_flake_updates(
+            flake_service,
+            test_gitea_service,
+            "",
+            "main",
+            "",
+            auto_merge=False,
         )
 
-        # Initialize git repo
-        subprocess.run(["git", "init", "-b", "main"], cwd=tmp_path, check=True)
-        subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Initial commit"],
-            cwd=tmp_path,
-            check=True,
-            env={
-                **os.environ,
-                "GIT_AUTHOR_NAME": "Test User",
-                "GIT_AUTHOR_EMAIL": "test@example.com",
-                "GIT_COMMITTER_NAME": "Test User",
-                "GIT_COMMITTER_EMAIL": "test@example.com",
-            },
-        )
+        # Verify NO pull request was created
+        assert len(test_gitea_service.pr_creation_attempts) == 0
 
-        # Add remote
-        remote_dir = tmp_path.parent / f"remote-{tmp_path.name}.git"
-        remote_dir.mkdir()
-        subprocess.run(["git", "init", "--bare"], cwd=remote_dir, check=True)
-        subprocess.run(
-            ["git", "remote", "add", "origin", str(remote_dir)],
-            cwd=tmp_path,
-            check=True,
+        # Verify we detected no changes
+        assert any(
+            "No changes for input local-test in flake.nix" in record.message
+            for record in caplog.records
         )
-        subprocess.run(
-            ["git", "push", "-u", "origin", "main"],
-            cwd=tmp_path,
-            check=True,
+
+        # Verify we're still on main branch
+        assert (tmp_path / ".git" / "HEAD").read_text().strip() == "ref: refs/heads/main"
+
+        # Verify no new commits on main
+        with Repo(str(tmp_path)) as repo:
+            commits = branch_history(repo, b"refs/heads/main")
+        single_commit = 1
+        assert len(commits) == single_commit
+        assert b"Initial commit" in commits[0].message
+
+    @pytest.mark.parametrize(
+        ("branch_suffix", "expected_branch"),
+        [
+            ("", "update-flake-utils"),
+            ("my-suffix", "update-flake-utils-my-suffix"),
+        ],
+    )
+    def test_with_updatable_flake_input(
+        self,
+        flake_with_updatable_input: Path,
+        branch_suffix: str,
+        expected_branch: str,
+    ) -> None:
+        """Test PR creation, with an optional branch suffix, when an input has updates."""
+        repo_path = flake_with_updatable_input
+
+        # Create test services
+        flake_service = FlakeService(repo_path=repo_path)
+        test_gitea_service = MockGiteaService(repo_path=repo_path)
+
+        # Process updates
+        process_flake_updates(
+            flake_service,
+            test_gitea_service,
+            "",
+            "main",
+            branch_suffix,
+            auto_merge=False,
         )
 
-        # Change to test directory
-        original_cwd = Path.cwd()
-        os.chdir(tmp_path)
+        # Verify pull request was created
+        assert len(test_gitea_service.pr_creation_attempts) == 1
 
-        try:
-            # Create test services with custom git author/committer
-            flake_service = FlakeService()
-            test_gitea_service = MockGiteaService()
-            test_gitea_service.git_author_name = "Custom Bot"
-            test_gitea_service.git_author_email = "custom@bot.com"
-            test_gitea_service.git_committer_name = "Custom Committer"
-            test_gitea_service.git_committer_email = "committer@bot.com"
+        pr_attempt = test_gitea_service.pr_creation_attempts[0]
+        assert pr_attempt.branch_name == expected_branch
+        assert pr_attempt.base_branch == "main"
+        assert pr_attempt.title == "Update flake-utils"
+        assert "updates the `flake-utils` input" in pr_attempt.body
+        assert pr_attempt.auto_merge is False
 
-            # Process updates
-            process_flake_updates(
-                flake_service,
-                test_gitea_service,
-                "",
-                "main",
-                "",
-                auto_merge=False,
-            )
+        # Verify we're back on main branch
+        assert (repo_path / ".git" / "HEAD").read_text().strip() == "ref: refs/heads/main"
 
-            # Verify the commit was made with custom author/committer
-            result = subprocess.run(
-                ["git", "log", "-1", "--format=%an <%ae>", "update-flake-utils"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            assert result.stdout.strip() == "Custom Bot <custom@bot.com>"
+        # Verify the update branch exists and has the commit
+        with Repo(str(repo_path)) as repo:
+            commits = branch_history(repo, f"refs/heads/{expected_branch}".encode())
+        expected_commits = 2
+        assert len(commits) == expected_commits
+        assert b"Update flake-utils" in commits[0].message
+        assert b"Initial commit" in commits[1].message
 
-            result = subprocess.run(
-                ["git", "log", "-1", "--format=%cn <%ce>", "update-flake-utils"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            assert result.stdout.strip() == "Custom Committer <committer@bot.com>"
+    def test_custom_git_author_committer(
+        self,
+        flake_with_updatable_input: Path,
+    ) -> None:
+        """Test that custom git author/committer configuration is used."""
+        repo_path = flake_with_updatable_input
+
+        # Create test services with custom git author/committer
+        flake_service = FlakeService(repo_path=repo_path)
+        test_gitea_service = MockGiteaService(repo_path=repo_path)
+        test_gitea_service.git_author_name = "Custom Bot"
+        test_gitea_service.git_author_email = "custom@bot.com"
+        test_gitea_service.git_committer_name = "Custom Committer"
+        test_gitea_service.git_committer_email = "committer@bot.com"
+
+        # Process updates
+        process_flake_updates(
+            flake_service,
+            test_gitea_service,
+            "",
+            "main",
+            "",
+            auto_merge=False,
+        )
 
-        finally:
-            os.chdir(original_cwd)
+        # Verify the commit was made with custom author/committer
+        with Repo(str(repo_path)) as repo:
+            commit = repo[repo.refs[b"refs/heads/update-flake-utils"]]
+        assert isinstance(commit, Commit)
+        assert commit.author == b"Custom Bot <custom@bot.com>"
+        assert commit.committer == b"Custom Committer <committer@bot.com>"
 
-    def test_branch_suffix(
+    def test_failed_input_does_not_stop_other_inputs(
         self,
         tmp_path: Path,
-        fixtures_path: Path,
+        caplog: pytest.LogCaptureFixture,
     ) -> None:
-        """Test that branch suffix is properly appended to branch names."""
-        # Create a flake with flake-utils
-        flake_content = """{
-  inputs = {
-    flake-utils.url = "github:numtide/flake-utils";
-  };
-
-  outputs = { self, flake-utils }: {
-    # Test flake
-  };
-}"""
-
-        (tmp_path / "flake.nix").write_text(flake_content)
-
-        # Copy old lock file from minimal fixture
-        shutil.copy(
-            fixtures_path / "minimal" / "flake.lock",
-            tmp_path / "flake.lock",
+        """Test that concurrent updates carry on past an input that fails."""
+        inputs = [f"input-{i}" for i in range(4)]
+        flake_service = StubFlakeService(
+            flakes=[Flake("flake.nix", inputs)],
+            failures={"input-1": FlakeServiceError("update failed")},
         )
-
-        # Initialize git repo
-        subprocess.run(["git", "init", "-b", "main"], cwd=tmp_path, check=True)
-        subprocess.run(["git", "add", "."], cwd=tmp_path, check=True)
-        subprocess.run(
-            ["git", "commit", "-m", "Initial commit"],
-            cwd=tmp_path,
-            check=True,
-            env={
-                **os.environ,
-                "GIT_AUTHOR_NAME": "Test User",
-                "GIT_AUTHOR_EMAIL": "test@example.com",
-                "GIT_COMMITTER_NAME": "Test User",
-                "GIT_COMMITTER_EMAIL": "test@example.com",
-            },
+        test_gitea_service = StubWorktreeGiteaService(repo_path=tmp_path)
+
+        process_flake_updates(
+            flake_service,
+            test_gitea_service,
+            "",
+            "main",
+            "",
+            auto_merge=False,
+            jobs=2,
         )
 
-        # Add remote
-        remote_dir = tmp_path.parent / f"remote-{tmp_path.name}.git"
-        remote_dir.mkdir()
-        subprocess.run(["git", "init", "--bare"], cwd=remote_dir, check=True)
-        subprocess.run(
-            ["git", "remote", "add", "origin", str(remote_dir)],
-            cwd=tmp_path,
-            check=True,
-        )
-        subprocess.run(
-            ["git", "push", "-u", "origin", "main"],
-            cwd=tmp_path,
-            check=True,
+        # Every other input still gets its pull request
+        created = sorted(pr.branch_name for pr in test_gitea_service.pr_creation_attempts)
+        assert created == ["update-input-0", "update-input-2", "update-input-3"]
+        assert any(
+            "Failed to update input input-1 in flake.nix" in record.message
+            for record in caplog.records
         )
 
-        # Change to test directory
-        original_cwd = Path.cwd()
-        os.chdir(tmp_path)
-
-        try:
-            # Create test services
-            flake_service = FlakeService()
-            test_gitea_service = MockGiteaService()
+    def test_interrupt_cancels_queued_inputs(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that an interrupt stops inputs that haven't started yet."""
+        # Started updates block until the interrupt has cancelled the queue
+        release = threading.Event()
+        monkeypatch.setattr(ReleasingThreadPoolExecutor, "release", release)
+        monkeypatch.setattr(concurrent.futures, "ThreadPoolExecutor", ReleasingThreadPoolExecutor)
+        inputs = [f"input-{i}" for i in range(8)]
+        flake_service = StubFlakeService(
+            flakes=[Flake("flake.nix", inputs)],
+            failures={"input-0": KeyboardInterrupt()},
+            release=release,
+        )
+        test_gitea_service = StubWorktreeGiteaService(repo_path=tmp_path)
 
-            # Process updates with branch suffix
+        with pytest.raises(KeyboardInterrupt):
             process_flake_updates(
                 flake_service,
                 test_gitea_service,
                 "",
                 "main",
-                "my-suffix",
+                "",
                 auto_merge=False,
+                jobs=2,
             )
 
-            # Verify pull request was created with suffix
-            assert len(test_gitea_service.pr_creation_attempts) == 1
+        # Only inputs already in progress when the interrupt arrived finish
+        assert release.is_set()
+        assert len(flake_service.updated_inputs) <= 2  # noqa: PLR2004 - one per worker
+        assert len(test_gitea_service.pr_creation_attempts) == len(flake_service.updated_inputs)
+
+    def test_lock_file_missing_from_worktree(self, tmp_path: Path) -> None:
+        """Test that an update creating a lock file that isn't committed yet opens a PR."""
+        flake_service = StubFlakeService(flakes=[Flake("flake.nix", ["flake-utils"])])
+        test_gitea_service = StubWorktreeGiteaService(repo_path=tmp_path, lock_in_worktree=False)
+
+        process_flake_updates(
+            flake_service,
+            test_gitea_service,
+            "",
+            "main",
+            "",
+            auto_merge=False,
+        )
 
-            pr_attempt = test_gitea_service.pr_creation_attempts[0]
-            assert pr_attempt["branch_name"] == "update-flake-utils-my-suffix"
-            assert pr_attempt["base_branch"] == "main"
-            assert pr_attempt["title"] == "Update flake-utils"
+        assert [pr.branch_name for pr in test_gitea_service.pr_creation_attempts] == [
+            "update-flake-utils",
+        ]
 
-            # Verify the branch exists with the suffix
-            result = subprocess.run(
-                ["git", "log", "--oneline", "update-flake-utils-my-suffix"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            commits = result.stdout.strip().split("\n")
-            expected_commits = 2
-            assert len(commits) == expected_commits
-            assert "Update flake-utils" in commits[0]
+    def test_failed_git_command_reports_stderr(self, tmp_path: Path) -> None:
+        """Test that a failing git command raises with git's error output."""
+        (tmp_path / "README.md").write_text("test\n")
+        make_repo_with_remote(tmp_path)
+        test_gitea_service = MockGiteaService(repo_path=tmp_path)
+
+        # The branch for the worktree can't be created over the existing main
+        with (
+            pytest.raises(GiteaServiceError, match=r"^git worktree failed: ") as exc_info,
+            test_gitea_service.worktree("main"),
+        ):
+            pass
 
-        finally:
-            os.chdir(original_cwd)
+        assert "'main' already exists" in str(exc_info.value)